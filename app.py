@@ -1,101 +1,392 @@
+import logging
+import os
+import tempfile
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
 import streamlit as st
 import yfinance as yf
+import numpy as np
 import pandas as pd
-import plotly.express as px
+import plotly.graph_objects as go
 
-# --- Configuración de la Página ---
-st.set_page_config(
-    page_title="Dashboard Financiero - Análisis de Activos",
-    page_icon="📈",
-    layout="wide"
+from config import (
+    KPIS,
+    RENAMES,
+    TICKERS_BIG_SEVEN,
+    TICKERS_CUSTOM_FIVE,
+    TICKERS_FX,
+    TICKERS_RATES,
+    TTL_BONDS,
+    TTL_EQUITIES,
+    TTL_FX,
+    TTL_REINTENTO,
+    UMBRAL_NVDA_CORRECCION,
+    UMBRAL_NVDA_EUFORIA,
+    UMBRAL_USDMXN_DEBIL,
+    UMBRAL_USDMXN_FUERTE
 )
+from kernels import corr_matrix
 
-# --- Definición de Tickers ---
-# "Big Seven"
-TICKERS_BIG_SEVEN = ['AAPL', 'MSFT', 'NVDA', 'GOOGL', 'AMZN', 'META', 'TSLA']
+logger = logging.getLogger(__name__)
 
-# 5 EMPRESAS A ELECCION
-TICKERS_CUSTOM_FIVE = ['JPM', 'JNJ', 'PG', 'KO', 'XOM'] 
+# --- Carga de Datos con Caché ---
+# Directorio de caché en disco (un archivo Parquet por tipo de activo y periodo),
+# para no volver a descargar todo cuando se reinicia el servidor
+CACHE_DIR = Path(".cache")
 
+def _descargar_ticker(ticker, period):
+    """
+    Descarga los precios de 'Close' de un solo ticker. Si la descarga falla
+    devuelve una serie vacía, para que el ticker quede como NaN sin afectar
+    al resto de su tipo de activo.
+    """
+    try:
+        serie = yf.Ticker(ticker).history(period=period)['Close']
+    except Exception as e:
+        logger.warning("No se pudo descargar %s: %s", ticker, e)
+        serie = None
+    if serie is None or serie.empty:
+        return pd.Series(dtype='float64', index=pd.DatetimeIndex([]), name=ticker)
 
-# Tipos de Cambio
-TICKERS_FX = ['MXN=X', 'EURUSD=X'] # USD/MXN y USD/EUR
+    serie.name = ticker
+    # Cada mercado trae su propia zona horaria; se alinean por fecha
+    serie.index = serie.index.tz_localize(None).normalize()
+    # Una fila intradía del día en curso puede repetir la fecha del último cierre
+    return serie[~serie.index.duplicated(keep='last')]
 
-# Bonos y Tasas (Usamos ETFs como proxy)
-TICKERS_RATES = ['SHY', 'CETETRC.MX'] # SHY = Bonos Tesoro USA, CETETRC.MX = CETES Mexico
+class DescargaFallidaError(Exception):
+    """No se pudo descargar un tipo de activo; 'respaldo' es la última copia en disco (o None)."""
+    def __init__(self, mensaje, respaldo=None):
+        super().__init__(mensaje)
+        self.respaldo = respaldo
 
-ALL_TICKERS = TICKERS_BIG_SEVEN + TICKERS_CUSTOM_FIVE + TICKERS_FX + TICKERS_RATES
+@st.cache_resource
+def _fallos_recientes():
+    """Hora y mensaje del último fallo de descarga por archivo de caché, compartido entre sesiones."""
+    return {}
 
-# --- Carga de Datos con Caché ---
-@st.cache_data(ttl=3600)
-def load_data(tickers, period="5y"):
+def _descargar_cierres(tickers, period, ttl, nombre):
     """
     Descarga datos históricos de 'Close' para la lista de tickers
-    y los devuelve en un DataFrame de pandas.
+    y los devuelve en un DataFrame de pandas. Si existe en disco una copia
+    con menos de 'ttl' segundos de antigüedad, se lee en su lugar.
+    Si la descarga falla se lanza DescargaFallidaError con la copia en disco
+    (aunque esté vencida) como respaldo, y no se reintenta contra yfinance
+    hasta que pasen TTL_REINTENTO segundos.
     """
+    ruta = CACHE_DIR / f"{nombre}_{period}.parquet"
+    respaldo = None
+    if ruta.exists():
+        try:
+            data = pd.read_parquet(ruta)
+        except Exception:
+            # Archivo dañado (p. ej. escritura interrumpida): se vuelve a descargar
+            data = None
+        if data is not None and list(data.columns) == list(tickers):
+            if time.time() - ruta.stat().st_mtime < ttl:
+                return data
+            respaldo = data
+
+    fallos = _fallos_recientes()
+    fallo = fallos.get(ruta.name)
+    if fallo is not None and time.time() - fallo[0] < TTL_REINTENTO:
+        raise DescargaFallidaError(fallo[1], respaldo)
+
     try:
-        # Añadir un try-except más específico para yfinance
-        data = yf.download(tickers, period=period)['Close']
-        if isinstance(data, pd.Series):
-             # Si solo se descarga un ticker, yfinance devuelve una Serie
-             data = data.to_frame() 
-        data.ffill(inplace=True) 
-        return data
+        # Las descargas son de red (IO), así que se lanzan en paralelo
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            series = executor.map(lambda ticker: _descargar_ticker(ticker, period), tickers)
+            data = pd.concat(dict(zip(tickers, series)), axis=1).sort_index()
+        if data.empty:
+            raise ValueError(f"yfinance no devolvió datos para {', '.join(tickers)}")
     except Exception as e:
-        st.error(f"Error al descargar datos. Asegúrate de que los tickers son válidos y hay conexión a internet: {e}")
-        return pd.DataFrame()
-
-# Cargar los datos
-data_historica = load_data(ALL_TICKERS)
-
-# RENOMBRAR COLUMNAS PARA MAYOR CLARIDAD
-if not data_historica.empty:
-    # Manejar el caso de un solo ticker descargado (data['Close'] sería una Serie, no un DataFrame)
-    if 'Close' in data_historica.columns:
-        # Esto es un manejo de caso límite que puede ocurrir en yfinance con un solo ticker
-        data_historica.columns = [
-            col.replace('SHY', 'Bonos_Tesoro_USA (SHY)')
-               .replace('CETETRC.MX', 'CETES_Mexico (ETF)')
-               .replace('MXN=X', 'USD/MXN')
-               .replace('EURUSD=X', 'EUR/USD')
-            for col in data_historica.columns
-        ]
+        fallos[ruta.name] = (time.time(), str(e))
+        # Streamlit no guarda excepciones en caché, así que el fallo no queda fijo por todo el TTL
+        raise DescargaFallidaError(str(e), respaldo) from e
+    fallos.pop(ruta.name, None)
+
+    # Rellenar solo las columnas que tienen huecos
+    nan_cols = data.columns[data.isna().any()].tolist()
+    if nan_cols:
+        data[nan_cols] = data[nan_cols].ffill()
+    # float32 es suficiente para precios y reduce a la mitad la memoria de cada cálculo
+    data = data.astype(np.float32)
+
+    # Escribir en un temporal y reemplazar de forma atómica, para que nunca
+    # se lea un archivo a medio escribir
+    CACHE_DIR.mkdir(exist_ok=True)
+    fd, temporal = tempfile.mkstemp(dir=CACHE_DIR, suffix='.parquet.tmp')
+    os.close(fd)
+    try:
+        data.to_parquet(temporal, compression='snappy')
+        os.replace(temporal, ruta)
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+    return data
+
+@st.cache_data(ttl=TTL_FX)
+def load_fx(tickers, period="5y"):
+    """Tipos de cambio: se refrescan con mayor frecuencia."""
+    return _descargar_cierres(tickers, period, TTL_FX, 'fx')
+
+@st.cache_data(ttl=TTL_EQUITIES)
+def load_equities(tickers, period="5y"):
+    """Acciones: frecuencia de refresco intermedia."""
+    return _descargar_cierres(tickers, period, TTL_EQUITIES, 'equities')
+
+@st.cache_data(ttl=TTL_BONDS)
+def load_bonds(tickers, period="5y"):
+    """Bonos y tasas: cambian lento, se refrescan con menor frecuencia."""
+    return _descargar_cierres(tickers, period, TTL_BONDS, 'bonds')
+
+class DescargaParcialError(Exception):
+    """Algún tipo de activo no se pudo actualizar; guarda lo que sí se obtuvo."""
+    def __init__(self, frames, errores, avisos):
+        super().__init__("; ".join(errores + avisos))
+        self.frames = frames
+        self.errores = errores
+        self.avisos = avisos
+
+def _combinar_precios(frames):
+    """
+    Une los DataFrames de cada tipo de activo y renombra las columnas.
+    Devuelve (DataFrame, activos sin datos); estos últimos se quitan del DataFrame
+    porque una columna toda NaN invalidaría todos los días de rendimientos.
+    """
+    data_historica = pd.concat(frames, axis=1).sort_index().ffill()
+
+    # RENOMBRAR COLUMNAS PARA MAYOR CLARIDAD
+    data_historica.columns = data_historica.columns.map(lambda col: RENAMES.get(col, col))
+
+    vacias = data_historica.isna().all()
+    sin_datos = vacias[vacias].index.tolist()
+    return data_historica.loc[:, ~vacias], sin_datos
+
+@st.cache_data(ttl=TTL_FX)
+def _load_prices_cached():
+    """
+    Precios combinados de todos los tipos de activo, en caché para no repetir
+    el concat/ffill/renombrado en cada interacción. Si falla algún tipo de activo
+    se lanza DescargaParcialError, así el resultado parcial no queda en caché
+    (los reintentos contra yfinance los limita _descargar_cierres).
+    """
+    clases = [
+        (load_equities, TICKERS_BIG_SEVEN + TICKERS_CUSTOM_FIVE),
+        (load_fx, TICKERS_FX),
+        (load_bonds, TICKERS_RATES)
+    ]
+    frames = []
+    errores = []
+    avisos = []
+    for loader, tickers in clases:
+        try:
+            frames.append(loader(tickers))
+        except DescargaFallidaError as e:
+            if e.respaldo is not None:
+                frames.append(e.respaldo)
+                avisos.append(f"No se pudieron actualizar los datos de {', '.join(tickers)}; se muestran los últimos guardados: {e}")
+            else:
+                errores.append(f"Error al descargar datos de {', '.join(tickers)}. Asegúrate de que los tickers son válidos y hay conexión a internet: {e}")
+    if errores or avisos:
+        raise DescargaParcialError(frames, errores, avisos)
+    return _combinar_precios(frames)
+
+def load_prices():
+    """
+    Combina los precios de todos los tipos de activo en un solo DataFrame.
+    Si un tipo de activo o un ticker no se pudo descargar, se muestra el aviso y se omite.
+    """
+    try:
+        data_historica, sin_datos = _load_prices_cached()
+    except DescargaParcialError as e:
+        for error in e.errores:
+            st.error(error)
+        for aviso in e.avisos:
+            st.warning(aviso)
+        if not e.frames:
+            return pd.DataFrame()
+        data_historica, sin_datos = _combinar_precios(e.frames)
+
+    if sin_datos:
+        st.warning(f"No se obtuvieron datos para: {', '.join(sin_datos)}. Se omiten del análisis.")
+    return data_historica
+
+# --- Transformaciones con Caché ---
+# Se recalculan solo cuando cambian los datos, no en cada interacción con los filtros
+@st.cache_data
+def compute_all(arr):
+    """
+    A partir de la matriz de precios (T días x N activos) calcula en una sola
+    pasada: precios normalizados a base 100, rendimientos diarios simples,
+    máscara de días con rendimientos completos y matriz de correlación del periodo completo.
+    """
+    arr = np.asarray(arr, dtype=np.float32)
+    norm = arr / arr[0] * 100
+    rendimientos = arr[1:] / arr[:-1] - 1
+    # Igual que dropna(): descartar los días con algún rendimiento faltante
+    validos = ~np.isnan(rendimientos).any(axis=1)
+    rendimientos = rendimientos[validos]
+
+    N = arr.shape[1]
+    if len(rendimientos) == 0:
+        return norm, rendimientos, validos, np.full((N, N), np.nan, dtype=np.float32)
+
+    Xc = rendimientos - rendimientos.mean(axis=0)
+    # einsum con optimize=True se resuelve como un solo producto de matrices (BLAS)
+    cov = np.einsum('ti,tj->ij', Xc, Xc, optimize=True) / len(rendimientos)
+    stds = np.sqrt(np.diag(cov))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        corr = cov / np.outer(stds, stds)
+    return norm, rendimientos, validos, corr
+
+def m4_downsample(valores, fechas, n_buckets=1200):
+    """
+    Reduce una serie de tiempo con agregación M4: en cada bucket de tiempo
+    conserva el primer, último, mínimo y máximo punto de cada columna.
+    Visualmente equivalente a la serie completa para un gráfico de ~n_buckets px.
+    """
+    if len(fechas) <= 4 * n_buckets:
+        return valores, fechas
+
+    tiempos = fechas.astype('datetime64[ns]').astype(np.int64)
+    # Bordes equiespaciados en el tiempo; searchsorted evita multiplicar nanosegundos (desborde de int64)
+    bordes = np.linspace(tiempos[0], tiempos[-1], n_buckets + 1)
+    buckets = np.searchsorted(bordes[1:-1], tiempos, side='right')
+    inicios = np.flatnonzero(np.diff(buckets, prepend=-1))
+    finales = np.append(inicios[1:], len(fechas)) - 1
+
+    mins = np.fmin.reduceat(valores, inicios, axis=0)
+    maxs = np.fmax.reduceat(valores, inicios, axis=0)
+    # Posición de cada fila dentro de la lista de buckets no vacíos
+    grupo = np.repeat(np.arange(len(inicios)), finales - inicios + 1)
+
+    conservar = ((valores == mins[grupo]) | (valores == maxs[grupo])).any(axis=1)
+    conservar[inicios] = True
+    conservar[finales] = True
+    return valores[conservar], fechas[conservar]
+
+# Matriz de precios/rendimientos como arreglos planos: valores (T x N),
+# posición de cada activo en las columnas y fechas de cada fila
+Frame = namedtuple('Frame', 'values cols dates')
+
+def select(frame, tickers, i0, i1):
+    """Devuelve (valores, fechas) de las filas i0:i1 para los tickers indicados."""
+    return frame.values[i0:i1][:, [frame.cols[t] for t in tickers]], frame.dates[i0:i1]
+
+def window(frame, inicio, fin):
+    """Posiciones [i0, i1) de las fechas entre inicio y fin (inclusive)."""
+    return int(np.searchsorted(frame.dates, inicio)), int(np.searchsorted(frame.dates, fin, side='right'))
+
+# --- Figuras con Caché ---
+# Se reconstruyen solo cuando cambian los activos, el rango o los datos ('version');
+# los parámetros con '_' no se usan como llave del caché
+@st.cache_resource(max_entries=32)
+def build_growth_fig(tickers, i0, i1, version, _norm):
+    """Gráfico de crecimiento acumulado (base 100)."""
+    valores, fechas = select(_norm, tickers, i0, i1)
+    # El gráfico no puede mostrar más puntos que píxeles; el histograma y la correlación usan los datos completos
+    valores, fechas = m4_downsample(valores, fechas)
+    fig = go.Figure([
+        go.Scattergl(x=fechas, y=valores[:, j], name=activo, mode='lines')
+        for j, activo in enumerate(tickers)
+    ])
+    # Mejorar el layout para la narrativa (Eje Y representa % de crecimiento)
+    fig.update_layout(
+        # Título que apoya la narrativa de asimetría
+        title="Rendimiento Asimétrico: Comparativa de Crecimiento de Activos",
+        xaxis_title="Date",
+        yaxis_title="Índice de Crecimiento (%)",
+        legend_title_text="variable"
+    )
+    return fig
+
+@st.cache_resource(max_entries=32)
+def build_hist_fig(tickers, r0, r1, version, _rend):
+    """Histograma comparativo de rendimientos diarios."""
+    valores, _ = select(_rend, tickers, r0, r1)
+    # Pre-agrupar en 100 bins comunes con numpy en lugar de enviar todos los puntos a Plotly
+    lo, hi = np.nanpercentile(valores, [0.1, 99.9])
+    if hi <= lo:
+        hi = lo + 1e-6
+    edges = np.linspace(lo, hi, 101)
+    centros = (edges[:-1] + edges[1:]) / 2
+
+    fig = go.Figure()
+    for j, activo in enumerate(tickers):
+        columna = valores[:, j]
+        counts, _ = np.histogram(columna[~np.isnan(columna)], bins=edges)
+        fig.add_bar(x=centros, y=counts, width=np.diff(edges), name=activo, opacity=0.7)
+
+    fig.update_layout(
+        barmode='overlay',
+        bargap=0,
+        legend_title_text='Activo',
+        xaxis_title="Rendimiento Diario",
+        yaxis_title="count",
+        # Título que apoya la narrativa de riesgo
+        title="Comparación de la Volatilidad (Distribución de Rendimientos Diarios)"
+    )
+    return fig
+
+@st.cache_resource(max_entries=32)
+def build_corr_fig(tickers, r0, r1, version, _rend, _corr_full):
+    """Mapa de calor de la matriz de correlación de rendimientos diarios."""
+    if r0 == 0 and r1 == len(_rend.dates):
+        # Periodo completo: basta con tomar las filas/columnas de la matriz precalculada
+        ids = [_rend.cols[t] for t in tickers]
+        matriz_corr = _corr_full[np.ix_(ids, ids)]
     else:
-        # Renombrar en el caso de múltiples tickers
-        data_historica.rename(columns={
-            'SHY': 'Bonos_Tesoro_USA (SHY)',
-            'CETETRC.MX': 'CETES_Mexico (ETF)',
-            'MXN=X': 'USD/MXN',
-            'EURUSD=X': 'EUR/USD'
-        }, inplace=True)
-
-if not data_historica.empty:
-    # --- Transformación: Cálculo de Rendimientos ---
-    data_normalizada = (data_historica / data_historica.iloc[0]) * 100
-    rendimientos_diarios = data_historica.pct_change().dropna()
+        valores, _ = select(_rend, tickers, r0, r1)
+        matriz_corr = corr_matrix(np.ascontiguousarray(valores, dtype=np.float32))
+
+    # Escala de color divergente centrada en 0 (Rojo/Negativo - Blanco/Cero - Azul/Positivo)
+    fig = go.Figure(go.Heatmap(
+        z=matriz_corr,
+        x=list(tickers),
+        y=list(tickers),
+        # Con muchos activos las etiquetas se enciman y su dibujo domina el render
+        texttemplate="%{z:.2f}" if len(tickers) <= 20 else None,
+        colorscale='RdBu_r',
+        zmin=-1, 
+        zmax=1
+    ))
+    fig.update_layout(
+        # Título que apoya la narrativa de diversificación
+        title="Correlación para Diversificación (Rendimientos Diarios)",
+        xaxis=dict(tickangle=45),
+        yaxis=dict(autorange='reversed')
+    )
+    return fig
 
+def sidebar_filtros(data_historica):
+    """Dibuja la barra lateral y devuelve (activos seleccionados, fecha inicio, fecha fin)."""
     # --- Sidebar: Filtros y Storytelling (NARRATIVA CON PROPÓSITO) ---
     st.sidebar.title("Análisis Financiero Táctico")
     st.sidebar.markdown("""
     **Propósito:** Este dashboard está diseñado para **gestionar el riesgo de concentración** en las acciones de alto crecimiento ('Big Seven') y evaluar estrategias de **diversificación** y cobertura cambiaria, con especial atención a la **perspectiva del inversor mexicano**.
-    
+
     *Utiliza los filtros para personalizar tu análisis y buscar coberturas.*
     """)
-    
+
     st.sidebar.header("Filtros del Dashboard")
-    
+
     # Filtro de Activos (Multiselect)
     activos_disponibles = list(data_historica.columns)
     activos_seleccionados = st.sidebar.multiselect(
         "Selecciona Activos para Comparar",
         options=activos_disponibles,
-        default=TICKERS_BIG_SEVEN # Inicia con las Big Seven
+        # Inicia con las Big Seven que se hayan podido descargar
+        default=[ticker for ticker in TICKERS_BIG_SEVEN if ticker in activos_disponibles]
     )
-    
+
     # Filtro de Rango de Fechas
     fecha_min = data_historica.index.min().to_pydatetime()
     fecha_max = data_historica.index.max().to_pydatetime()
-    
+
     fecha_inicio = st.sidebar.date_input(
         "Fecha de Inicio", 
         value=fecha_min,
@@ -108,67 +399,115 @@ if not data_historica.empty:
         min_value=fecha_min,
         max_value=fecha_max
     )
-    
+
     # Asegurar que la fecha de inicio no sea posterior a la fecha de fin
     if fecha_inicio > fecha_fin:
         st.sidebar.error("Error: La fecha de inicio no puede ser posterior a la fecha de fin.")
         # Usar el rango completo si hay error en las fechas, para evitar fallos
-        fecha_inicio_ts = data_historica.index.min()
-        fecha_fin_ts = data_historica.index.max()
+        fecha_inicio_ts = pd.Timestamp(fecha_min)
+        fecha_fin_ts = pd.Timestamp(fecha_max)
     else:
         # Filtrar datos según las fechas seleccionadas
         fecha_inicio_ts = pd.Timestamp(fecha_inicio)
         fecha_fin_ts = pd.Timestamp(fecha_fin)
     
-    # Aplicar filtros
-    if activos_seleccionados:
-        data_filtrada = data_normalizada.loc[fecha_inicio_ts:fecha_fin_ts, activos_seleccionados]
-        rendimientos_filtrados = rendimientos_diarios.loc[fecha_inicio_ts:fecha_fin_ts, activos_seleccionados]
+    return activos_seleccionados, fecha_inicio_ts, fecha_fin_ts
+
+def build_kpis(data_historica):
+    """Tarjetas con el último precio y el cambio diario de los activos en KPIS."""
+    # Últimos dos cierres de los activos de los KPIs (NaN si falta alguno)
+    last2 = data_historica.reindex(columns=[columna for columna, _, _ in KPIS]).tail(2).to_numpy()
+    if len(last2) < 2:
+        # Con menos de dos días no hay cambio diario: completar con NaN para mostrar "N/A"
+        last2 = np.vstack([np.full((2 - len(last2), len(KPIS)), np.nan), last2])
+    ultimos_precios = last2[1]
+    cambios = last2[1] / last2[0] - 1
+    
+    for (_, etiqueta, formato), col, precio, cambio in zip(KPIS, st.columns(len(KPIS)), ultimos_precios, cambios):
+        if np.isnan(cambio):
+            col.metric(etiqueta, "N/A", "N/A")
+        else:
+            col.metric(etiqueta, f"${precio:{formato}}", f"{cambio:.2%}")
+
+def render_alertas(data_historica):
+    """Umbrales tácticos y alertas automáticas de NVIDIA y USD/MXN."""
+    # --- Sistema de Alertas (Umbrales Tácticos y Realistas) ---
+    st.subheader("Sistema de Alertas Automáticas (Puntos de Decisión) 🔔")
+
+    # --- MOSTRAR UMBRALES CON FORMATO LIMPIO (USANDO COLUMNAS) ---
+    st.markdown("**Umbrales de Decisión:**")
+
+    col_nvda_corr, col_nvda_euph, col_mxn_fuerte, col_mxn_debil = st.columns(4)
+
+    col_nvda_corr.metric("NVDA Soporte Clave (Corr.)", f"${UMBRAL_NVDA_CORRECCION:.2f}", "Riesgo Bajista")
+    col_nvda_euph.metric("NVDA Euforia (Sobrecompra)", f"${UMBRAL_NVDA_EUFORIA:.2f}", "Riesgo de Corrección")
+    col_mxn_fuerte.metric("USD/MXN Peso Fuerte", f"${UMBRAL_USDMXN_FUERTE:.2f}", "Oportunidad USD")
+    col_mxn_debil.metric("USD/MXN Peso Débil", f"${UMBRAL_USDMXN_DEBIL:.2f}", "Riesgo Cambiario")
+
+    st.markdown("---")
+
+
+    # Último precio de cada activo con alerta (NaN si falta la columna o el dato)
+    precio_actual_nvda, precio_actual_usdmxn = data_historica.reindex(columns=['NVDA', 'USD/MXN']).iloc[-1].to_numpy()
+
+    # Alerta 1: Corrección Agresiva / Euforia de Nvidia 
+    if np.isnan(precio_actual_nvda):
+        st.error("No se pudo verificar la alerta de NVIDIA.")
+    elif precio_actual_nvda < UMBRAL_NVDA_CORRECCION:
+        st.warning(f"🚨 CORRECCIÓN AGRESIVA: NVIDIA ({precio_actual_nvda:.2f}) ha caído por debajo del soporte clave de **${UMBRAL_NVDA_CORRECCION:.2f}**. Riesgo de baja extendida.")
+    elif precio_actual_nvda > UMBRAL_NVDA_EUFORIA: 
+        st.info(f"🚀 EUFORIA: NVIDIA ({precio_actual_nvda:.2f}) cotiza en zona de máximos (${UMBRAL_NVDA_EUFORIA:.0f}+), posible señal de sobrecompra o burbuja.")
     else:
-        # Manejar caso de no selección de activos
-        data_filtrada = pd.DataFrame()
-        rendimientos_filtrados = pd.DataFrame()
+        st.success(f"NVIDIA ({precio_actual_nvda:.2f}) se mantiene en rango operativo.")
 
+    # Alerta 2: Fortaleza o Debilidad Extrema del Peso Mexicano (USD/MXN)
+    if np.isnan(precio_actual_usdmxn):
+        st.error("No se pudo verificar la alerta de USD/MXN.")
+    elif precio_actual_usdmxn > UMBRAL_USDMXN_DEBIL:
+        st.error(f"⚠️ RIESGO MXN: El USD/MXN ({precio_actual_usdmxn:.2f}) está **por encima de ${UMBRAL_USDMXN_DEBIL:.2f}** (Peso Débil). Momento de evaluar cobertura cambiaria.")
+    elif precio_actual_usdmxn < UMBRAL_USDMXN_FUERTE:
+        st.success(f"🟢 OPORTUNIDAD MXN: El USD/MXN ({precio_actual_usdmxn:.2f}) está **por debajo de ${UMBRAL_USDMXN_FUERTE:.2f}** (Peso Fuerte). Momento ideal para cambiar pesos a USD.")
+    else:
+        st.info(f"USD/MXN ({precio_actual_usdmxn:.2f}) se mantiene en rango neutro (${UMBRAL_USDMXN_FUERTE:.2f} - ${UMBRAL_USDMXN_DEBIL:.2f}).")
 
-    # --- Dashboard Layout ---
-    st.title("📈 Dashboard Financiero: Gestión de Riesgo en Big Tech y Cobertura MXN")
+def main():
+    """Arma el dashboard completo; Streamlit la vuelve a ejecutar en cada interacción."""
+    # --- Configuración de la Página ---
+    st.set_page_config(
+        page_title="Dashboard Financiero - Análisis de Activos",
+        page_icon="📈",
+        layout="wide"
+    )
 
-    # --- Fila 1: Tarjetas de Datos (KPIs) ---
-    st.header("Métricas Clave (Último Día)")
-    
-    col1, col2, col3, col4 = st.columns(4)
+    data_historica = load_prices()
+    if data_historica.empty:
+        st.error("No se pudieron cargar los datos. Revisa la conexión o los tickers.")
+        return
+
+    # --- Transformación: Cálculo de Rendimientos ---
+    valores_norm, valores_rend, validos, corr_full = compute_all(data_historica.to_numpy())
+    cols = {col: i for i, col in enumerate(data_historica.columns)}
+    norm = Frame(valores_norm, cols, data_historica.index.values)
+    rend = Frame(valores_rend, cols, data_historica.index.values[1:][validos])
+
+    activos_seleccionados, fecha_inicio_ts, fecha_fin_ts = sidebar_filtros(data_historica)
     
-    # === KPI 1: APPLE ===
-    try:
-        ultimo_precio_aapl = data_historica['AAPL'].iloc[-1]
-        cambio_aapl = (data_historica['AAPL'].iloc[-1] / data_historica['AAPL'].iloc[-2]) - 1
-        col1.metric("Apple (AAPL)", f"${ultimo_precio_aapl:.2f}", f"{cambio_aapl:.2%}")
-    except:
-        col1.metric("Apple (AAPL)", "N/A", "N/A")
+    # Aplicar filtros
+    # (los rendimientos no incluyen el primer día, así que tienen sus propios límites)
+    inicio, fin = np.datetime64(fecha_inicio_ts), np.datetime64(fecha_fin_ts)
+    i0, i1 = window(norm, inicio, fin)
+    r0, r1 = window(rend, inicio, fin)
+    tickers_key = tuple(sorted(activos_seleccionados))
+    # Identifica la versión de los datos para invalidar las figuras cuando se refrescan
+    version = (norm.values.shape, str(norm.dates[-1]), norm.values[-1].tobytes())
 
-    # === KPI 2: USD/MXN ===
-    try:
-        ultimo_precio_usdmxn = data_historica['USD/MXN'].iloc[-1]
-        cambio_usdmxn = (data_historica['USD/MXN'].iloc[-1] / data_historica['USD/MXN'].iloc[-2]) - 1
-        col2.metric("USD/MXN", f"${ultimo_precio_usdmxn:.2f}", f"{cambio_usdmxn:.2%}")
-    except:
-        col2.metric("USD/MXN", "N/A", "N/A")
 
-    # === KPI 3: CETES ===
-    try:
-        ultimo_precio_cetes = data_historica['CETES_Mexico (ETF)'].iloc[-1]
-        cambio_cetes = (data_historica['CETES_Mexico (ETF)'].iloc[-1] / data_historica['CETES_Mexico (ETF)'].iloc[-2]) - 1
-        col3.metric("CETES_Mexico (ETF)", f"${ultimo_precio_cetes:.2f}", f"{cambio_cetes:.2%}")
-    except:
-        col3.metric("CETES_Mexico (ETF)", "N/A", "N/A")
+    # --- Dashboard Layout ---
+    st.title("📈 Dashboard Financiero: Gestión de Riesgo en Big Tech y Cobertura MXN")
 
-    # === KPI 4: EUR/USD ===
-    try:
-        ultimo_precio_eurusd = data_historica['EUR/USD'].iloc[-1]
-        cambio_eurusd = (data_historica['EUR/USD'].iloc[-1] / data_historica['EUR/USD'].iloc[-2]) - 1
-        col4.metric("EUR/USD", f"${ultimo_precio_eurusd:.4f}", f"{cambio_eurusd:.2%}")
-    except:
-        col4.metric("EUR/USD", "N/A", "N/A")
+    # --- Fila 1: Tarjetas de Datos (KPIs) ---
+    st.header("Métricas Clave (Último Día)")
+    build_kpis(data_historica)
 
     # --- Separador ---
     st.markdown("---")
@@ -180,14 +519,8 @@ if not data_historica.empty:
     
     with col_izq:
         st.subheader("Crecimiento Acumulado (Base 100)")
-        if not data_filtrada.empty:
-            fig_crecimiento = px.line(
-                data_filtrada,
-                # Título que apoya la narrativa de asimetría
-                title="Rendimiento Asimétrico: Comparativa de Crecimiento de Activos"
-            )
-            # Mejorar el layout para la narrativa (Eje Y representa % de crecimiento)
-            fig_crecimiento.update_layout(yaxis_title="Índice de Crecimiento (%)")
+        if tickers_key and i1 > i0:
+            fig_crecimiento = build_growth_fig(tickers_key, i0, i1, version, norm)
             st.plotly_chart(fig_crecimiento, use_container_width=True)
         else:
             st.info("Selecciona activos y un rango de fechas válido para ver el gráfico de crecimiento.")
@@ -197,23 +530,8 @@ if not data_historica.empty:
         st.subheader("Distribución de Rendimientos Diarios (Volatilidad Comparada) ")
         
         # --- Histograma Comparativo de Volatilidad ---
-        if not rendimientos_filtrados.empty and len(activos_seleccionados) > 0:
-            
-            # Transformar el DataFrame de rendimientos a formato "long" para Plotly
-            df_long = rendimientos_filtrados.melt(ignore_index=False, var_name='Activo', value_name='Rendimiento Diario')
-            
-            fig_hist = px.histogram(
-                df_long,
-                x='Rendimiento Diario',
-                color='Activo',
-                nbins=100,
-                opacity=0.7, 
-                barmode='overlay', 
-                # Título que apoya la narrativa de riesgo
-                title="Comparación de la Volatilidad (Distribución de Rendimientos Diarios)"
-            )
-            
-            fig_hist.update_layout(xaxis_title="Rendimiento Diario")
+        if tickers_key and r1 > r0:
+            fig_hist = build_hist_fig(tickers_key, r0, r1, version, rend)
             
             st.plotly_chart(fig_hist, use_container_width=True)
         else:
@@ -228,72 +546,13 @@ if not data_historica.empty:
     col_alertas, col_corr = st.columns(2)
     
     with col_alertas:
-        # --- Sistema de Alertas (Umbrales Tácticos y Realistas) ---
-        st.subheader("Sistema de Alertas Automáticas (Puntos de Decisión) 🔔")
-        
-        # --- DEFINICIÓN DE UMBRALES TÁCTICOS ---
-        umbral_nvda_correccion = 150.0 
-        umbral_nvda_euforia = 750.0 
-        umbral_usdmxn_debil = 19.00 
-        umbral_usdmxn_fuerte = 17.00
-        
-        # --- MOSTRAR UMBRALES CON FORMATO LIMPIO (USANDO COLUMNAS) ---
-        st.markdown("**Umbrales de Decisión:**")
-        
-        col_nvda_corr, col_nvda_euph, col_mxn_fuerte, col_mxn_debil = st.columns(4)
-        
-        col_nvda_corr.metric("NVDA Soporte Clave (Corr.)", f"${umbral_nvda_correccion:.2f}", "Riesgo Bajista")
-        col_nvda_euph.metric("NVDA Euforia (Sobrecompra)", f"${umbral_nvda_euforia:.2f}", "Riesgo de Corrección")
-        col_mxn_fuerte.metric("USD/MXN Peso Fuerte", f"${umbral_usdmxn_fuerte:.2f}", "Oportunidad USD")
-        col_mxn_debil.metric("USD/MXN Peso Débil", f"${umbral_usdmxn_debil:.2f}", "Riesgo Cambiario")
-
-        st.markdown("---")
-
-        
-        # Alerta 1: Corrección Agresiva / Euforia de Nvidia 
-        try:
-            precio_actual_nvda = data_historica['NVDA'].iloc[-1]
-            
-            if precio_actual_nvda < umbral_nvda_correccion:
-                st.warning(f"🚨 CORRECCIÓN AGRESIVA: NVIDIA ({precio_actual_nvda:.2f}) ha caído por debajo del soporte clave de **${umbral_nvda_correccion:.2f}**. Riesgo de baja extendida.")
-            elif precio_actual_nvda > umbral_nvda_euforia: 
-                st.info(f"🚀 EUFORIA: NVIDIA ({precio_actual_nvda:.2f}) cotiza en zona de máximos ($750+), posible señal de sobrecompra o burbuja.")
-            else:
-                st.success(f"NVIDIA ({precio_actual_nvda:.2f}) se mantiene en rango operativo.")
-        except:
-            st.error("No se pudo verificar la alerta de NVIDIA.")
-            
-        # Alerta 2: Fortaleza o Debilidad Extrema del Peso Mexicano (USD/MXN)
-        try:
-            precio_actual_usdmxn = data_historica['USD/MXN'].iloc[-1]
-            
-            if precio_actual_usdmxn > umbral_usdmxn_debil:
-                st.error(f"⚠️ RIESGO MXN: El USD/MXN ({precio_actual_usdmxn:.2f}) está **por encima de ${umbral_usdmxn_debil:.2f}** (Peso Débil). Momento de evaluar cobertura cambiaria.")
-            elif precio_actual_usdmxn < umbral_usdmxn_fuerte:
-                st.success(f"🟢 OPORTUNIDAD MXN: El USD/MXN ({precio_actual_usdmxn:.2f}) está **por debajo de ${umbral_usdmxn_fuerte:.2f}** (Peso Fuerte). Momento ideal para cambiar pesos a USD.")
-            else:
-                st.info(f"USD/MXN ({precio_actual_usdmxn:.2f}) se mantiene en rango neutro (${umbral_usdmxn_fuerte:.2f} - ${umbral_usdmxn_debil:.2f}).")
-        except:
-            st.error("No se pudo verificar la alerta de USD/MXN.")
+        render_alertas(data_historica)
 
 
     with col_corr:
         st.subheader("Matriz de Correlación (Mitigación de Riesgo)")
-        if not rendimientos_filtrados.empty and len(activos_seleccionados) > 1:
-            matriz_corr = rendimientos_filtrados.corr()
-            
-            # Escala de color divergente centrada en 0 (Rojo/Negativo - Blanco/Cero - Azul/Positivo)
-            fig_corr = px.imshow(
-                matriz_corr,
-                text_auto=".2f", 
-                aspect="auto",
-                color_continuous_scale='RdBu_r', 
-                zmin=-1, 
-                zmax=1,
-                # Título que apoya la narrativa de diversificación
-                title="Correlación para Diversificación (Rendimientos Diarios)"
-            )
-            fig_corr.update_layout(xaxis=dict(tickangle=45)) 
+        if r1 > r0 and len(tickers_key) > 1:
+            fig_corr = build_corr_fig(tickers_key, r0, r1, version, rend, corr_full)
             st.plotly_chart(fig_corr, use_container_width=True)
         else:
             st.info("Selecciona más de un activo para ver la matriz de correlación.")
@@ -302,8 +561,9 @@ if not data_historica.empty:
     st.markdown("---")
             
     # --- Fila 4: Datos Crudos ---
-    st.subheader("Datos Históricos (Últimos 10 días) ")
-    st.dataframe(data_historica[activos_seleccionados].tail(10))
+    # Colapsado por defecto: la tabla solo se construye dentro del expander
+    with st.expander("Datos Históricos (Últimos 10 días)", expanded=False):
+        st.dataframe(data_historica[activos_seleccionados].tail(10))
 
-else:
-    st.error("No se pudieron cargar los datos. Revisa la conexión o los tickers.")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""Constantes del dashboard: tickers, nombres, KPIs, TTL de caché y umbrales de alertas."""
+
+# --- Definición de Tickers ---
+# "Big Seven"
+TICKERS_BIG_SEVEN = ['AAPL', 'MSFT', 'NVDA', 'GOOGL', 'AMZN', 'META', 'TSLA']
+
+# 5 EMPRESAS A ELECCION
+TICKERS_CUSTOM_FIVE = ['JPM', 'JNJ', 'PG', 'KO', 'XOM'] 
+
+
+# Tipos de Cambio
+TICKERS_FX = ['MXN=X', 'EURUSD=X'] # USD/MXN y USD/EUR
+
+# Bonos y Tasas (Usamos ETFs como proxy)
+TICKERS_RATES = ['SHY', 'CETETRC.MX'] # SHY = Bonos Tesoro USA, CETETRC.MX = CETES Mexico
+
+# Nombres legibles para los tickers que no son acciones
+RENAMES = {
+    'SHY': 'Bonos_Tesoro_USA (SHY)',
+    'CETETRC.MX': 'CETES_Mexico (ETF)',
+    'MXN=X': 'USD/MXN',
+    'EURUSD=X': 'EUR/USD'
+}
+
+# Tarjetas de KPIs: (columna, etiqueta, formato del precio)
+KPIS = [
+    ('AAPL', 'Apple (AAPL)', '.2f'),
+    ('USD/MXN', 'USD/MXN', '.2f'),
+    ('CETES_Mexico (ETF)', 'CETES_Mexico (ETF)', '.2f'),
+    ('EUR/USD', 'EUR/USD', '.4f')
+]
+
+# TTL de caché (segundos) según qué tan rápido cambia cada tipo de activo
+TTL_FX = 900 # 15 minutos
+TTL_EQUITIES = 21600 # 6 horas
+TTL_BONDS = 86400 # 24 horas
+
+# Tras un fallo de descarga, segundos antes de volver a intentar contra yfinance
+TTL_REINTENTO = 60
+
+# --- Umbrales Tácticos de Alertas ---
+UMBRAL_NVDA_CORRECCION = 150.0
+UMBRAL_NVDA_EUFORIA = 750.0
+UMBRAL_USDMXN_DEBIL = 19.00
+UMBRAL_USDMXN_FUERTE = 17.00
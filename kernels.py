@@ -0,0 +1,44 @@
+"""
+Kernels numéricos compilados con numba.
+
+Viven en un módulo aparte porque Streamlit vuelve a ejecutar app.py en cada
+interacción; este módulo se importa una sola vez por proceso, así que el
+kernel se compila (y se precalienta) una sola vez.
+"""
+import numpy as np
+from numba import njit
+
+# fastmath sin 'nnan'/'ninf' para que una columna constante siga produciendo NaN
+# Sin parallel=True: Streamlit llama al kernel desde varios hilos a la vez y la capa
+# 'workqueue' de numba no es segura entre hilos; con ≤16 activos no hace falta
+@njit(fastmath={'reassoc', 'contract', 'arcp'}, cache=True, error_model='numpy')
+def corr_matrix(X):
+    """
+    Matriz de correlación de Pearson entre las columnas de X (T días x N activos).
+    X no debe contener NaN.
+    """
+    T, N = X.shape
+    Xc = np.empty((T, N), np.float64)
+    stds = np.empty(N, np.float64)
+    for j in range(N):
+        media = 0.0
+        for t in range(T):
+            media += X[t, j]
+        media /= T
+        suma_cuadrados = 0.0
+        for t in range(T):
+            Xc[t, j] = X[t, j] - media
+            suma_cuadrados += Xc[t, j] * Xc[t, j]
+        stds[j] = np.sqrt(suma_cuadrados / T)
+
+    out = np.empty((N, N), np.float64)
+    for i in range(N):
+        for j in range(N):
+            acumulado = 0.0
+            for t in range(T):
+                acumulado += Xc[t, i] * Xc[t, j]
+            out[i, j] = acumulado / (T * stds[i] * stds[j])
+    return out
+
+# Compilar el kernel al importar para no pagar el JIT en la primera interacción
+corr_matrix(np.array([[1.0, 2.0], [2.0, 1.0], [3.0, 5.0]], dtype=np.float32))